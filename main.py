@@ -1,10 +1,52 @@
 from fastmcp import FastMCP
+from fastmcp.utilities.types import Image
+import psutil
 
+import asyncio
+import ctypes
+import os
 import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 
 # Initialize the MCP server
 mcp = FastMCP("desktop-automation")
 
+# Shared UIA desktop handle and a short-lived snapshot of its top-level windows.
+# Enumerating windows walks the whole UIA tree, so back-to-back tool calls reuse it.
+_DESKTOP_CACHE = {"obj": None, "ts": 0, "wins": None}
+
+def _get_desktop():
+    """
+    Returns the shared UIA Desktop object, creating it on first use.
+    """
+    if _DESKTOP_CACHE["obj"] is None:
+        # 'uia' backend is better for modern applications (Chrome, VS Code, etc.)
+        from pywinauto import Desktop
+        from pywinauto.timings import Timings
+        
+        # Don't sit in pywinauto's default retry/settle waits
+        Timings.window_find_timeout = 0
+        Timings.after_clickinput_wait = 0
+        
+        _DESKTOP_CACHE["obj"] = Desktop(backend="uia")
+    return _DESKTOP_CACHE["obj"]
+
+def _get_windows(ttl: float = 0.5):
+    """
+    Returns the desktop's top-level windows, reusing the last snapshot if it is
+    younger than `ttl` seconds.
+    """
+    now = time.monotonic()
+    if _DESKTOP_CACHE["wins"] is None or now - _DESKTOP_CACHE["ts"] > ttl:
+        _DESKTOP_CACHE["wins"] = _get_desktop().windows()
+        _DESKTOP_CACHE["ts"] = now
+    return _DESKTOP_CACHE["wins"]
+
 @mcp.tool()
 def list_windows() -> list[str]:
     """
@@ -12,14 +54,11 @@ def list_windows() -> list[str]:
     Returns a list of strings, where each string is a window title.
     """
     try:
-        # 'uia' backend is better for modern applications (Chrome, VS Code, etc.)
-        from pywinauto import Desktop
-        desktop = Desktop(backend="uia")
-        windows = desktop.windows()
+        windows = _get_windows()
         
-        # Filter out windows with empty titles and return the list
-        window_titles = [w.window_text() for w in windows if w.window_text()]
-        return list(set(window_titles)) # Remove duplicates
+        # Filter out windows with empty titles and drop duplicates, keeping order.
+        # window_text() is a COM call, so fetch it once per window.
+        return list(dict.fromkeys(t for t in (w.window_text() for w in windows) if t))
     except Exception as e:
         return [f"Error listing windows: {str(e)}"]
 
@@ -32,19 +71,18 @@ def focus_window(title_substring: str) -> str:
         title_substring: A part of the window title to search for (case-insensitive).
     """
     try:
-        from pywinauto import Desktop
-        desktop = Desktop(backend="uia")
-        # Find windows that match the substring
-        windows = desktop.windows()
-        matches = [w for w in windows if title_substring.lower() in w.window_text().lower()]
+        # Find the first window that matches the substring
+        needle = title_substring.lower()
+        target_window, actual_title = None, None
+        for w in _get_windows():
+            text = w.window_text()
+            if needle in text.lower():
+                target_window, actual_title = w, text
+                break
         
-        if not matches:
+        if target_window is None:
             return f"No window found containing '{title_substring}'"
         
-        # Pick the first match (or maybe the one with the shortest title? logic can be improved)
-        target_window = matches[0]
-        actual_title = target_window.window_text()
-        
         # Restore if minimized, then focus
         if target_window.get_show_state() == 2: # 2 is Minimized
             target_window.restore()
@@ -64,11 +102,10 @@ def open_application(app_name: str) -> str:
         app_name: The name of the application to open (e.g., 'notepad', 'calc', 'spotify', 'chrome').
                   This works best with applications that are in the system PATH or registered in Windows.
     """
-    import subprocess
     try:
-        # Use 'start' command in Windows shell to launch the app
-        # This leverages Windows' own ability to find apps by name
-        subprocess.Popen(f"start {app_name}", shell=True)
+        # ShellExecute finds apps by name the same way the 'start' command does,
+        # without spawning cmd.exe or passing the name through a shell
+        os.startfile(app_name)
         return f"Attempted to open '{app_name}'"
     except Exception as e:
         return f"Failed to open '{app_name}': {str(e)}"
@@ -114,14 +151,19 @@ def volume_control(action: str, steps: int = 5) -> str:
             send_keys('{VOLUME_MUTE}')
             return "Toggled mute"
         
-        key = '{VOLUME_UP}' if action == 'up' else '{VOLUME_DOWN}' if action == 'down' else None
+        key = 'VOLUME_UP' if action == 'up' else 'VOLUME_DOWN' if action == 'down' else None
         
         if not key:
             return f"Unknown volume action: {action}"
             
-        # Press the key 'steps' times
-        for _ in range(steps):
-            send_keys(key)
+        # Press the key 'steps' times in one go
+        if steps > 0:
+            if sys.platform == "win32":
+                # All 'steps' down/up pairs in a single SendInput call
+                vk = VK_VOLUME_UP if action == 'up' else VK_VOLUME_DOWN
+                _send_inputs([_key_input(vk=vk), _key_input(vk=vk, flags=KEYEVENTF_KEYUP)] * steps)
+            else:
+                send_keys(f"{{{key} {steps}}}")
             
         return f"Volume {action} by {steps} steps"
     except Exception as e:
@@ -129,14 +171,29 @@ def volume_control(action: str, steps: int = 5) -> str:
 
 # --- Phase 1: System Context Tools ---
 
+# Prime psutil's CPU baseline so the first non-blocking reading is meaningful
+psutil.cpu_percent(interval=None)
+
+# Last CPU reading, reused for calls that come in quicker than the sampling window
+_CPU_CACHE = {"ts": 0, "value": None}
+
+def _get_cpu_percent(min_interval: float = 0.2) -> float:
+    """
+    Returns CPU usage since the previous reading without blocking. Calls made within
+    `min_interval` seconds of each other get the same reading back.
+    """
+    now = time.monotonic()
+    if _CPU_CACHE["value"] is None or now - _CPU_CACHE["ts"] > min_interval:
+        _CPU_CACHE["value"] = psutil.cpu_percent(interval=None)
+        _CPU_CACHE["ts"] = now
+    return _CPU_CACHE["value"]
+
 @mcp.tool()
 def get_system_stats() -> str:
     """
     Returns current system statistics: CPU usage, RAM usage, and Battery status.
     """
-    import psutil
-    
-    cpu = psutil.cpu_percent(interval=0.1)
+    cpu = _get_cpu_percent()
     memory = psutil.virtual_memory()
     battery = psutil.sensors_battery()
     
@@ -158,33 +215,61 @@ def list_processes(limit: int = 10) -> str:
     Args:
         limit: Number of processes to list (default 10).
     """
-    import psutil
+    import heapq
     
     procs = []
-    for proc in psutil.process_iter(['pid', 'name', 'memory_percent']):
+    for proc in psutil.process_iter():
         try:
-            procs.append(proc.info)
+            # oneshot() reads the process info once for all the fields below
+            with proc.oneshot():
+                procs.append((proc.pid, proc.name(), proc.memory_percent()))
         except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
             pass
             
-    # Sort by memory usage
-    procs.sort(key=lambda p: p['memory_percent'] or 0, reverse=True)
+    # Only the top `limit` entries are needed, no need to sort everything
+    top = heapq.nlargest(limit, procs, key=lambda p: p[2])
     
     output = "Top Processes by Memory:\n"
-    for p in procs[:limit]:
-        mem = p['memory_percent'] or 0
-        output += f"- {p['name']} (PID: {p['pid']}): {mem:.1f}%\n"
+    for pid, name, mem in top:
+        output += f"- {name} (PID: {pid}): {mem:.1f}%\n"
         
     return output
 
+@contextmanager
+def _open_clipboard(retries: int = 10, delay: float = 0.01):
+    """
+    Opens the Windows clipboard directly through pywin32 and closes it afterwards.
+    Another process may be holding the clipboard, so opening is retried briefly.
+    """
+    import win32clipboard
+    for attempt in range(retries):
+        try:
+            win32clipboard.OpenClipboard()
+            break
+        except win32clipboard.error:
+            if attempt == retries - 1:
+                raise
+            time.sleep(delay)
+    try:
+        yield win32clipboard
+    finally:
+        win32clipboard.CloseClipboard()
+
 @mcp.tool()
 def clipboard_read() -> str:
     """
     Reads the current content of the system clipboard.
     """
-    import pyperclip
     try:
-        content = pyperclip.paste()
+        if sys.platform == "win32":
+            with _open_clipboard() as clipboard:
+                if clipboard.IsClipboardFormatAvailable(clipboard.CF_UNICODETEXT):
+                    content = clipboard.GetClipboardData(clipboard.CF_UNICODETEXT)
+                else:
+                    content = ""
+        else:
+            import pyperclip
+            content = pyperclip.paste()
         return f"Clipboard Content:\n{content}"
     except Exception as e:
         return f"Failed to read clipboard: {str(e)}"
@@ -197,45 +282,164 @@ def clipboard_write(content: str) -> str:
     Args:
         content: The text to copy to the clipboard.
     """
-    import pyperclip
     try:
-        pyperclip.copy(content)
+        if sys.platform == "win32":
+            with _open_clipboard() as clipboard:
+                clipboard.EmptyClipboard()
+                clipboard.SetClipboardText(content, clipboard.CF_UNICODETEXT)
+        else:
+            import pyperclip
+            pyperclip.copy(content)
         return "Successfully copied to clipboard."
     except Exception as e:
         return f"Failed to write to clipboard: {str(e)}"
 
 # --- Phase 2: GUI Automation Tools ---
 
-@mcp.tool()
-def take_screenshot() -> str:
-    """
-    Takes a screenshot of the primary screen and returns it as a base64 encoded string.
+# Win32 SendInput structures, so a whole batch of input events goes out in one call
+# instead of pyautogui's one call (plus Python overhead) per key.
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+MOUSEEVENTF_LEFTDOWN = 0x0002
+MOUSEEVENTF_LEFTUP = 0x0004
+VK_VOLUME_DOWN = 0xAE
+VK_VOLUME_UP = 0xAF
+
+# pyautogui makes the process DPI-aware when it is imported. Do the same up front so
+# raw Win32 cursor calls use the physical pixels that screenshots report, whichever
+# tool happens to run first.
+if sys.platform == "win32":
+    ctypes.windll.user32.SetProcessDPIAware()
+
+class _MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", ctypes.c_long),
+        ("dy", ctypes.c_long),
+        ("mouseData", ctypes.c_ulong),
+        ("dwFlags", ctypes.c_ulong),
+        ("time", ctypes.c_ulong),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+class _KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", ctypes.c_ushort),
+        ("wScan", ctypes.c_ushort),
+        ("dwFlags", ctypes.c_ulong),
+        ("time", ctypes.c_ulong),
+        ("dwExtraInfo", ctypes.c_size_t),
+    ]
+
+class _INPUT_UNION(ctypes.Union):
+    _fields_ = [("mi", _MOUSEINPUT), ("ki", _KEYBDINPUT)]
+
+class _INPUT(ctypes.Structure):
+    _anonymous_ = ("u",)
+    _fields_ = [("type", ctypes.c_ulong), ("u", _INPUT_UNION)]
+
+def _get_pyautogui():
+    """
+    Imports pyautogui with its per-call pause and fail-safe corner check turned off,
+    which otherwise add overhead to every mouse and keyboard action.
     """
     import pyautogui
-    import base64
+    pyautogui.PAUSE = 0
+    pyautogui.FAILSAFE = False
+    return pyautogui
+
+def _mouse_input(flags: int) -> _INPUT:
+    """
+    Builds a single mouse INPUT event at the current cursor position.
+    """
+    event = _INPUT(type=INPUT_MOUSE)
+    event.mi = _MOUSEINPUT(dwFlags=flags)
+    return event
+
+def _key_input(vk: int = 0, scan: int = 0, flags: int = 0) -> _INPUT:
+    """
+    Builds a single keyboard INPUT event.
+    """
+    event = _INPUT(type=INPUT_KEYBOARD)
+    event.ki = _KEYBDINPUT(wVk=vk, wScan=scan, dwFlags=flags)
+    return event
+
+def _send_inputs(events: list) -> None:
+    """
+    Sends all the given INPUT events with a single SendInput call.
+    """
+    array = (_INPUT * len(events))(*events)
+    sent = ctypes.windll.user32.SendInput(len(events), array, ctypes.sizeof(_INPUT))
+    if sent != len(events):
+        # UIPI blocks input to elevated windows without setting the last error,
+        # so WinError() would just say "the operation completed successfully"
+        raise OSError(f"SendInput sent only {sent} of {len(events)} input events (blocked by another process?)")
+
+# Characters that have to be sent as real key presses rather than Unicode input
+_TEXT_VIRTUAL_KEYS = {"\n": 0x0D, "\t": 0x09} # VK_RETURN, VK_TAB
+
+def _text_inputs(text: str) -> list:
+    """
+    Builds the key down/up events that type out the text as Unicode input.
+    """
+    events = []
+    for ch in text.replace("\r\n", "\n").replace("\r", "\n"):
+        vk = _TEXT_VIRTUAL_KEYS.get(ch)
+        if vk:
+            events += [_key_input(vk=vk), _key_input(vk=vk, flags=KEYEVENTF_KEYUP)]
+            continue
+        # Characters outside the BMP go out as two UTF-16 surrogates
+        data = ch.encode("utf-16-le")
+        for i in range(0, len(data), 2):
+            unit = int.from_bytes(data[i:i + 2], "little")
+            events += [
+                _key_input(scan=unit, flags=KEYEVENTF_UNICODE),
+                _key_input(scan=unit, flags=KEYEVENTF_UNICODE | KEYEVENTF_KEYUP),
+            ]
+    return events
+
+def _take_screenshot() -> Image | str:
+    """
+    Blocking part of take_screenshot(), run in a worker thread.
+    """
+    pyautogui = _get_pyautogui()
     from io import BytesIO
     
     try:
         # Capture screenshot
         screenshot = pyautogui.screenshot()
         
-        # Convert to base64
+        # Encode to PNG and hand the bytes to MCP as an image block.
+        # zlib level 1 is several times faster than the default 6 for a slightly larger file.
         buffered = BytesIO()
-        screenshot.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        screenshot.save(buffered, format="PNG", compress_level=1)
         
-        return f"Screenshot taken. Base64 length: {len(img_str)}. Data: data:image/png;base64,{img_str}"
+        return Image(data=buffered.getvalue(), format="png")
     except Exception as e:
         return f"Failed to take screenshot: {str(e)}"
 
+@mcp.tool()
+async def take_screenshot() -> Image | str:
+    """
+    Takes a screenshot of the primary screen and returns it as a PNG image.
+    """
+    return await asyncio.to_thread(_take_screenshot)
+
 @mcp.tool()
 def click_at(x: int, y: int) -> str:
     """
     Moves the mouse to (x, y) and clicks.
     """
-    import pyautogui
     try:
-        pyautogui.click(x, y)
+        if sys.platform == "win32":
+            # Move and click with two Win32 calls instead of going through pyautogui
+            if not ctypes.windll.user32.SetCursorPos(x, y):
+                raise ctypes.WinError()
+            _send_inputs([_mouse_input(MOUSEEVENTF_LEFTDOWN), _mouse_input(MOUSEEVENTF_LEFTUP)])
+        else:
+            pyautogui = _get_pyautogui()
+            pyautogui.click(x, y)
         return f"Clicked at ({x}, {y})"
     except Exception as e:
         return f"Failed to click at ({x}, {y}): {str(e)}"
@@ -249,13 +453,25 @@ def type_text(text: str, interval: float = 0.0) -> str:
         text: The string to type.
         interval: Delay between each character (default 0.0).
     """
-    import pyautogui
     try:
-        pyautogui.write(text, interval=interval)
+        if sys.platform == "win32" and interval <= 0:
+            # Type the whole string with one SendInput call
+            if text:
+                _send_inputs(_text_inputs(text))
+        else:
+            pyautogui = _get_pyautogui()
+            pyautogui.write(text, interval=interval)
         return f"Typed text: '{text}'"
     except Exception as e:
         return f"Failed to type text: {str(e)}"
 
+@lru_cache(maxsize=64)
+def _parse_hotkey(keys: str) -> tuple[str, ...]:
+    """
+    Splits a hotkey string like 'Ctrl + C' into pyautogui key names ('ctrl', 'c').
+    """
+    return tuple(k.strip().lower() for k in keys.split('+'))
+
 @mcp.tool()
 def press_hotkey(keys: str) -> str:
     """
@@ -264,12 +480,9 @@ def press_hotkey(keys: str) -> str:
     Args:
         keys: A string of keys separated by '+', e.g., 'ctrl+c', 'alt+tab', 'win+r'.
     """
-    import pyautogui
+    pyautogui = _get_pyautogui()
     try:
-        key_list = keys.split('+')
-        # Clean up whitespace
-        key_list = [k.strip().lower() for k in key_list]
-        pyautogui.hotkey(*key_list)
+        pyautogui.hotkey(*_parse_hotkey(keys))
         return f"Pressed hotkey: {keys}"
     except Exception as e:
         return f"Failed to press hotkey '{keys}': {str(e)}"
@@ -279,7 +492,7 @@ def get_screen_size() -> str:
     """
     Returns the width and height of the screen.
     """
-    import pyautogui
+    pyautogui = _get_pyautogui()
     width, height = pyautogui.size()
     return f"Screen Size: {width}x{height}"
 
@@ -287,45 +500,67 @@ def get_screen_size() -> str:
 
 # --- Phase 2.5: Browser Automation Tools ---
 
+# Headless Chromium shared by the browser tools, launched on first use.
+# Each call gets its own context, which is far cheaper than a cold launch.
+# The async API keeps page loads from blocking the server's event loop.
+_PLAYWRIGHT = None
+_BROWSER = None
+_BROWSER_LOCK = asyncio.Lock()
+
+async def _get_browser():
+    """
+    Returns the shared headless Chromium browser, launching it if needed.
+    The Playwright driver is a child process, so it exits along with the server.
+    """
+    global _PLAYWRIGHT, _BROWSER
+    async with _BROWSER_LOCK:
+        if _BROWSER is None or not _BROWSER.is_connected():
+            from playwright.async_api import async_playwright
+            
+            if _PLAYWRIGHT is None:
+                _PLAYWRIGHT = await async_playwright().start()
+            _BROWSER = await _PLAYWRIGHT.chromium.launch(headless=True)
+    return _BROWSER
+
 @mcp.tool()
-def browser_navigate(url: str) -> str:
+async def browser_navigate(url: str) -> str:
     """
     Navigates to a URL using a headless browser and returns the page title and text content.
     """
     try:
-        from playwright.sync_api import sync_playwright
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(url)
-            title = page.title()
-            content = page.inner_text('body')
-            browser.close()
+        context = await (await _get_browser()).new_context()
+        try:
+            page = await context.new_page()
+            await page.goto(url)
+            # Fetch the title and the text snippet in one round-trip, truncating
+            # in the page so the full body text never crosses the Playwright pipe
+            title, content = await page.evaluate(
+                "(limit) => [document.title, ((document.body && document.body.innerText) || '').slice(0, limit)]",
+                500,
+            )
+        finally:
+            await context.close()
             
-            # Truncate content to avoid hitting token limits
-            return f"Page Title: {title}\n\nContent Snippet:\n{content[:500]}..."
+        # Content is truncated to avoid hitting token limits
+        return f"Page Title: {title}\n\nContent Snippet:\n{content}..."
     except Exception as e:
         return f"Failed to navigate to {url}: {str(e)}"
 
 @mcp.tool()
-def browser_screenshot(url: str) -> str:
+async def browser_screenshot(url: str) -> Image | str:
     """
-    Navigates to a URL and takes a screenshot. Returns base64 image.
+    Navigates to a URL and takes a screenshot. Returns a PNG image.
     """
     try:
-        from playwright.sync_api import sync_playwright
-        import base64
-        
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(url)
-            screenshot_bytes = page.screenshot()
-            browser.close()
+        context = await (await _get_browser()).new_context()
+        try:
+            page = await context.new_page()
+            await page.goto(url)
+            screenshot_bytes = await page.screenshot()
+        finally:
+            await context.close()
             
-            img_str = base64.b64encode(screenshot_bytes).decode("utf-8")
-            return f"Screenshot of {url} taken. Data: data:image/png;base64,{img_str}"
+        return Image(data=screenshot_bytes, format="png")
     except Exception as e:
         return f"Failed to take browser screenshot: {str(e)}"
 
@@ -333,43 +568,152 @@ def browser_screenshot(url: str) -> str:
 
 # --- Phase 3: Local RAG Tools ---
 
-# Global variable to hold the vector store in memory for simplicity
-# In a real app, you'd persist this to disk
+# Global variable to hold the vector store in memory.
+# It is also saved under INDEX_DIR so a restart doesn't have to re-embed everything.
+# The notes tools run in worker threads, so swapping or saving it takes the lock.
 vector_store = None
+_VECTOR_STORE_LOCK = threading.Lock()
 
-@mcp.tool()
-def index_notes(directory_path: str) -> str:
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jarvis_index")
+INDEX_FINGERPRINT_FILE = os.path.join(INDEX_DIR, "fingerprint.txt")
+
+# Embedding model, loaded once and shared by index_notes() and query_notes()
+_EMBEDDINGS = None
+_EMBEDDINGS_LOCK = threading.Lock()
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+NORMALIZE_EMBEDDINGS = True
+INDEX_TYPE = "IndexHNSWFlat" # the FAISS index _build_index() creates
+
+# Everything that decides what the saved vectors look like. It leads the fingerprint
+# so an index built with other settings is never reused.
+INDEX_SETTINGS = f"{EMBEDDING_MODEL}|normalize={NORMALIZE_EMBEDDINGS}|{INDEX_TYPE}"
+
+def _get_embeddings():
     """
-    Indexes text files (.txt, .md) in the given directory for semantic search.
-    This might take a while for many files.
+    Returns the shared sentence-transformer embeddings, loading the model on first use.
+    Runs on the GPU when one is available.
+    """
+    global _EMBEDDINGS
+    with _EMBEDDINGS_LOCK:
+        if _EMBEDDINGS is None:
+            import torch
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            
+            # Using a small, fast model
+            _EMBEDDINGS = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL,
+                model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
+                encode_kwargs={"batch_size": 64, "normalize_embeddings": NORMALIZE_EMBEDDINGS},
+            )
+    return _EMBEDDINGS
+
+def _find_notes(directory_path: str) -> tuple[list[str], int]:
+    """
+    Returns the paths of all .md and .txt files under the directory, in one walk,
+    along with the latest modification time of any directory visited.
+    Hidden files and directories (.obsidian, .trash, .git, ...) are skipped.
+    """
+    paths = []
+    latest_dir_mtime = 0
+    for root, dirs, files in os.walk(directory_path):
+        # Renaming or moving a note only touches the mtime of its directory
+        latest_dir_mtime = max(latest_dir_mtime, os.stat(root).st_mtime_ns)
+        # Prune in place so os.walk doesn't descend into hidden directories
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in files:
+            if not name.startswith(".") and name.endswith((".md", ".txt")):
+                paths.append(os.path.join(root, name))
+    return paths, latest_dir_mtime
+
+def _notes_fingerprint(directory_path: str, paths: list[str], latest_dir_mtime: int) -> str:
+    """
+    Cheap change detector for a notes directory: the index settings, its path, the
+    count of note files under it and the latest modification time of those files
+    and of the directories that hold them.
+    """
+    latest = latest_dir_mtime
+    for path in paths:
+        latest = max(latest, os.stat(path).st_mtime_ns)
+    return f"{INDEX_SETTINGS}|{os.path.abspath(directory_path)}|{len(paths)}|{latest}"
+
+def _load_saved_index(embeddings):
+    """
+    Loads the FAISS index saved by index_notes(), or returns None if there isn't one
+    or it was built with different index settings.
+    """
+    from langchain_community.vectorstores import FAISS
+    
+    if not os.path.exists(os.path.join(INDEX_DIR, "index.faiss")) or not os.path.exists(INDEX_FINGERPRINT_FILE):
+        return None
+    with open(INDEX_FINGERPRINT_FILE, encoding="utf-8") as f:
+        if not f.read().startswith(INDEX_SETTINGS + "|"):
+            return None
+    # The index was written by this server, so unpickling its docstore is safe
+    return FAISS.load_local(INDEX_DIR, embeddings, allow_dangerous_deserialization=True)
+
+@lru_cache(maxsize=128)
+def _embed_query(query: str) -> tuple[float, ...]:
+    """
+    Embeds a search query, caching the result so repeated questions skip the model.
+    """
+    return tuple(_get_embeddings().embed_query(query))
+
+def _build_index(docs, embeddings):
+    """
+    Embeds the documents into a new FAISS store backed by an HNSW graph index,
+    which searches in roughly O(log N) instead of the flat index's O(N).
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    
+    texts = [doc.page_content for doc in docs]
+    vectors = embeddings.embed_documents(texts)
+    
+    store = FAISS(embeddings, faiss.IndexHNSWFlat(len(vectors[0]), 32), InMemoryDocstore(), {})
+    store.add_embeddings(zip(texts, vectors), metadatas=[doc.metadata for doc in docs])
+    return store
+
+def _index_notes(directory_path: str) -> str:
+    """
+    Blocking part of index_notes(), run in a worker thread.
     """
     global vector_store
-    import os
     
     try:
-        from langchain_community.document_loaders import DirectoryLoader, TextLoader
-        from langchain_community.vectorstores import FAISS
-        from langchain_community.embeddings import HuggingFaceEmbeddings
+        from langchain_community.document_loaders import TextLoader
 
         if not os.path.exists(directory_path):
             return f"Directory not found: {directory_path}"
             
-        # Load documents
-        loader = DirectoryLoader(directory_path, glob="**/*.md", loader_cls=TextLoader)
-        docs = loader.load()
+        embeddings = _get_embeddings()
         
-        if not docs:
-             # Try .txt if no .md found
-            loader = DirectoryLoader(directory_path, glob="**/*.txt", loader_cls=TextLoader)
-            docs = loader.load()
+        # Reuse the saved index if nothing changed since it was built
+        paths, latest_dir_mtime = _find_notes(directory_path)
+        fingerprint = _notes_fingerprint(directory_path, paths, latest_dir_mtime)
+        if os.path.exists(INDEX_FINGERPRINT_FILE):
+            with open(INDEX_FINGERPRINT_FILE, encoding="utf-8") as f:
+                if f.read() == fingerprint:
+                    saved = _load_saved_index(embeddings)
+                    if saved is not None:
+                        with _VECTOR_STORE_LOCK:
+                            vector_store = saved
+                        return f"Loaded existing index of {directory_path} ({saved.index.ntotal} documents, unchanged since last run)."
+            
+        # Load documents in parallel, reading files is I/O-bound
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+            docs = [doc for loaded in pool.map(lambda p: TextLoader(p).load(), paths) for doc in loaded]
             
         if not docs:
             return "No .md or .txt files found to index."
             
-        # Create embeddings and vector store
-        # Using a small, fast model
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        vector_store = FAISS.from_documents(docs, embeddings)
+        # Create the vector store and save it for the next run
+        store = _build_index(docs, embeddings)
+        with _VECTOR_STORE_LOCK:
+            vector_store = store
+            store.save_local(INDEX_DIR)
+            with open(INDEX_FINGERPRINT_FILE, "w", encoding="utf-8") as f:
+                f.write(fingerprint)
         
         return f"Successfully indexed {len(docs)} documents from {directory_path}."
         
@@ -377,19 +721,36 @@ def index_notes(directory_path: str) -> str:
         return f"Failed to index notes: {str(e)}"
 
 @mcp.tool()
-def query_notes(query: str) -> str:
+async def index_notes(directory_path: str) -> str:
     """
-    Searches the indexed notes for the given query and returns relevant snippets.
-    You must call index_notes() first.
+    Indexes text files (.txt, .md) in the given directory for semantic search.
+    This might take a while for many files. If the files haven't changed since the
+    last run, the saved index is loaded instead.
+    """
+    return await asyncio.to_thread(_index_notes, directory_path)
+
+def _query_notes(query: str) -> str:
+    """
+    Blocking part of query_notes(), run in a worker thread.
     """
     global vector_store
     
-    if vector_store is None:
+    with _VECTOR_STORE_LOCK:
+        if vector_store is None:
+            # Pick up an index saved by a previous run, if any
+            try:
+                vector_store = _load_saved_index(_get_embeddings())
+            except Exception as e:
+                return f"Failed to load saved index: {str(e)}"
+        # Search this store even if index_notes() swaps in a new one meanwhile
+        store = vector_store
+    
+    if store is None:
         return "No notes indexed yet. Please call index_notes(directory_path) first."
         
     try:
-        # Search
-        results = vector_store.similarity_search(query, k=3)
+        # Search with the (possibly cached) query embedding
+        results = store.similarity_search_by_vector(list(_embed_query(query)), k=3)
         
         output = f"Results for '{query}':\n\n"
         for doc in results:
@@ -401,24 +762,64 @@ def query_notes(query: str) -> str:
     except Exception as e:
         return f"Failed to query notes: {str(e)}"
 
+@mcp.tool()
+async def query_notes(query: str) -> str:
+    """
+    Searches the indexed notes for the given query and returns relevant snippets.
+    You must call index_notes() first.
+    """
+    return await asyncio.to_thread(_query_notes, query)
+
 
 
 # --- Phase 4: The Personality Tools ---
 
-@mcp.tool()
-def speak_text(text: str) -> str:
+# pyttsx3 enumerates the SAPI5 voices over COM on init, so the engine is created once.
+# It isn't thread-safe and belongs to the thread that created it, so all speech
+# goes through this single-worker executor.
+_TTS_ENGINE = None
+
+def _init_tts_thread():
     """
-    Speaks the given text using the system's text-to-speech engine.
+    Initializes COM on the TTS thread. comtypes only does this for the thread that
+    first imports it, which may well be the main thread (via pywinauto).
+    """
+    if sys.platform == "win32":
+        import comtypes
+        comtypes.CoInitialize()
+
+_TTS_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts", initializer=_init_tts_thread)
+
+def _get_tts():
+    """
+    Returns the shared pyttsx3 engine, initializing it on first use.
+    Must only be called from the TTS executor thread.
+    """
+    global _TTS_ENGINE
+    if _TTS_ENGINE is None:
+        import pyttsx3
+        _TTS_ENGINE = pyttsx3.init()
+    return _TTS_ENGINE
+
+def _speak_text(text: str) -> str:
+    """
+    Blocking part of speak_text(), run on the TTS executor thread.
     """
-    import pyttsx3
     try:
-        engine = pyttsx3.init()
+        engine = _get_tts()
         engine.say(text)
         engine.runAndWait()
         return f"Spoke: '{text}'"
     except Exception as e:
         return f"Failed to speak text: {str(e)}"
 
+@mcp.tool()
+async def speak_text(text: str) -> str:
+    """
+    Speaks the given text using the system's text-to-speech engine.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_TTS_EXECUTOR, _speak_text, text)
+
 @mcp.tool()
 def show_notification(title: str, message: str) -> str:
     """
@@ -440,31 +841,43 @@ def show_notification(title: str, message: str) -> str:
 
 # --- Phase 5 & 6: The Eye & DJ Pro ---
 
-@mcp.tool()
-def take_webcam_photo() -> str:
+def _take_webcam_photo() -> str:
     """
-    Captures a photo from the default webcam and returns it as a base64 string.
+    Blocking part of take_webcam_photo(), run in a worker thread.
     """
     import cv2
     import base64
     
     try:
-        cap = cv2.VideoCapture(0)
+        # DirectShow opens much faster than the default MSMF backend on Windows
+        if sys.platform == "win32":
+            cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+        else:
+            cap = cv2.VideoCapture(0)
         if not cap.isOpened():
             return "Failed to open webcam."
             
-        # Warm up camera
+        # The first frames after opening are often black or underexposed while
+        # auto-exposure settles. Skip a few with grab(), which doesn't decode,
+        # for at most ~100 ms, then decode only the frame we keep.
+        warmup_end = time.monotonic() + 0.1
         for _ in range(5):
-            cap.read()
-            
-        ret, frame = cap.read()
+            if not cap.grab() or time.monotonic() > warmup_end:
+                break
+        ret, frame = cap.retrieve()
+        
+        # Slow cameras can still be dark at this point, so keep reading for up to
+        # another 0.5 s until the frame isn't near-black
+        dark_end = time.monotonic() + 0.5
+        while ret and frame.mean() < 10 and time.monotonic() < dark_end:
+            ret, frame = cap.read()
         cap.release()
         
         if not ret:
             return "Failed to capture frame."
             
         # Encode to JPG
-        _, buffer = cv2.imencode('.jpg', frame)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
         img_str = base64.b64encode(buffer).decode("utf-8")
         
         return f"Webcam photo taken. Data: data:image/jpeg;base64,{img_str}"
@@ -472,24 +885,54 @@ def take_webcam_photo() -> str:
         return f"Failed to take webcam photo: {str(e)}"
 
 @mcp.tool()
-def play_specific_song(song_name: str) -> str:
+async def take_webcam_photo() -> str:
+    """
+    Captures a photo from the default webcam and returns it as a base64 string.
+    """
+    return await asyncio.to_thread(_take_webcam_photo)
+
+def _foreground_process_name() -> str | None:
+    """
+    Returns the executable name of the process that owns the foreground window.
+    """
+    hwnd = ctypes.windll.user32.GetForegroundWindow()
+    if not hwnd:
+        return None
+    pid = ctypes.c_ulong()
+    ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    try:
+        return psutil.Process(pid.value).name()
+    except psutil.Error:
+        return None
+
+@mcp.tool()
+async def play_specific_song(song_name: str) -> str:
     """
     Plays a specific song on Spotify.
     WARNING: This assumes Spotify is installed and logged in.
     It opens Spotify search and simulates pressing 'Enter' to play the top result.
     """
-    import subprocess
-    import pyautogui
-    import time
+    from urllib.parse import quote
+    pyautogui = _get_pyautogui()
     
     try:
         # Open Spotify to the search page for the song
         # The URI scheme 'spotify:search:query' opens the search tab
-        query = song_name.replace(" ", "%20")
-        subprocess.Popen(f"start spotify:search:{query}", shell=True)
+        os.startfile(f"spotify:search:{quote(song_name)}")
+        
+        # Wait (up to 5s) for Spotify to come to the foreground, since that's where
+        # the keys below go. Its window title can't be used: while playing it shows
+        # the current track instead of "Spotify".
+        for _ in range(50):
+            if (_foreground_process_name() or "").lower() == "spotify.exe":
+                break
+            await asyncio.sleep(0.1)
+        else:
+            # Don't type into whatever unrelated window has focus
+            return f"Opened Spotify for '{song_name}', but it didn't come to the foreground, so nothing was played."
         
-        # Wait for Spotify to open and load (adjust time if needed)
-        time.sleep(3.0) 
+        # Give the search results a moment to render
+        await asyncio.sleep(0.5)
         
         # Press 'Enter' to select the top result (usually the song)
         # Sometimes you need to tab down, but usually 'Enter' on the search result plays it
@@ -502,7 +945,7 @@ def play_specific_song(song_name: str) -> str:
         # Let's try: Tab -> Enter.
         
         pyautogui.press('tab')
-        time.sleep(0.5)
+        await asyncio.sleep(0.5)
         pyautogui.press('enter')
         
         return f"Opened Spotify for '{song_name}' and attempted to play."